@@ -1,8 +1,15 @@
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 from dotenv import load_dotenv
+import asyncio
 import json
+import orjson
+import os
 
 from fastapi import FastAPI, UploadFile, File, Form
+from fastapi.responses import JSONResponse, ORJSONResponse
 from orchestrator import OCROrchestrator
 
 # Load environment variables from .env file
@@ -10,23 +17,59 @@ load_dotenv()
 
 ocr_orchestrator = OCROrchestrator()
 
-app = FastAPI()
+# Dedicated pool for the blocking OCR/LLM pipeline, so slow model calls don't
+# compete with FastAPI's shared threadpool
+LLM_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_POOL_SIZE", "64")),
+    thread_name_prefix="llm",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    LLM_POOL.shutdown(wait=False)
+
+
+class ORJSONFallbackResponse(ORJSONResponse):
+    """Serialize with orjson, falling back to the stdlib encoder for integers wider than 64 bits."""
+    def render(self, content: Any) -> bytes:
+        try:
+            return super().render(content)
+        except orjson.JSONEncodeError:
+            return JSONResponse.render(self, content)
+
+
+app = FastAPI(default_response_class=ORJSONFallbackResponse, lifespan=lifespan)
+
+
+async def run_in_llm_pool(func: Callable, *args) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(LLM_POOL, partial(func, *args))
+
 
 @app.get("/health")
 def health():
     return {"status": "healthy"}
 
 @app.post("/v1/ocr-md")
-def ocr_md(file: UploadFile = File(...)):
-    return ocr_orchestrator.process_ocr_markdown(file)
+async def ocr_md(file: UploadFile = File(...)):
+    file_bytes = await file.read()
+    # OCR calls block on the OpenAI API, so keep them off the event loop
+    return await run_in_llm_pool(
+        ocr_orchestrator.process_ocr_markdown, file_bytes, file.content_type, file.filename
+    )
 
 
 @app.post("/v1/ocr-json")
-def ocr_json(file: UploadFile = File(...), schema: str = Form(...)):
+async def ocr_json(file: UploadFile = File(...), schema: str = Form(...), verbose: bool = False):
     try:
-        # Parse the schema from JSON string
+        # Parse the schema from JSON string (stdlib json keeps integers wider than 64 bits exact)
         parsed_schema = json.loads(schema)
-        return ocr_orchestrator.process_ocr_json(file, parsed_schema)
+        file_bytes = await file.read()
+        return await run_in_llm_pool(
+            ocr_orchestrator.process_ocr_json, file_bytes, file.content_type, file.filename, parsed_schema, verbose
+        )
     except json.JSONDecodeError as e:
         return {"error": f"Invalid JSON schema: {str(e)}"}
     except Exception as e:
@@ -1,13 +1,26 @@
 import re
 import json
-import editdistance
+from rapidfuzz import fuzz
+from rapidfuzz.distance import Levenshtein
 import pandas as pd
 from collections import Counter
 from typing import Dict, List, Tuple
 import os
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 
 # ---------- Text Normalization ----------
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+# Only runs of 2+ spaces need rewriting; matching single spaces just copies them
+_MULTISPACE_RE = re.compile(r' {2,}')
+_BOLD_RE = re.compile(r'\*\*([^*]+)\*\*')
+_ITALIC_STAR_RE = re.compile(r'\*([^*]+)\*')
+_ITALIC_UNDERSCORE_RE = re.compile(r'_([^_]+)_')
+_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+_BULLET_RE = re.compile(r'^[\s]*[\*\+][\s]*', flags=re.MULTILINE)
+# Every styling/bullet pattern above needs at least one of these
+_MARKDOWN_MARKERS = ('*', '_', '`', '+')
+
 def normalize_text(text: str) -> str:
     """
     Prepare OCR outputs for fair comparison against ground truth.
@@ -29,50 +42,50 @@ def normalize_text(text: str) -> str:
     text = text.replace('\\n', '\n').replace('\\t', '\t').replace('\\r', '\r')
 
     # Step 2: Convert HTML tables to Markdown tables
-    try:
-        # Parse HTML and find tables
-        soup = BeautifulSoup(text, 'html.parser')
-        tables = soup.find_all('table')
-
-        for table in tables:
-            markdown_table = html_table_to_markdown(table)
-            table.replace_with(markdown_table)
-
-        # Get text content, stripping remaining HTML tags
-        text = soup.get_text()
-    except:
-        # Fallback: simple HTML tag removal
-        text = re.sub(r'<[^>]+>', '', text)
+    # Text without tags or entities comes out of the parser unchanged, so skip it
+    if '<' in text or '&' in text:
+        try:
+            # Parse HTML and find tables
+            soup = BeautifulSoup(text, 'html.parser')
+            tables = soup.find_all('table')
+
+            for table in tables:
+                markdown_table = html_table_to_markdown(table)
+                table.replace_with(markdown_table)
+
+            # Get text content, stripping remaining HTML tags
+            text = soup.get_text()
+        except:
+            # Fallback: simple HTML tag removal
+            text = _HTML_TAG_RE.sub('', text)
 
     # Step 3: Normalize whitespace
     # Collapse multiple spaces into one
-    text = re.sub(r' +', ' ', text)
+    text = _MULTISPACE_RE.sub(' ', text)
     # Normalize newlines (handle different line endings)
-    text = re.sub(r'\r\n|\r', '\n', text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
 
     # Step 4: Lowercase everything
     text = text.lower()
 
-    # Step 5: Remove redundant Markdown styling
-    # Strip bold (**text**)
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)
-    # Strip italics (*text* or _text_)
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)
-    text = re.sub(r'_([^_]+)_', r'\1', text)
-    # Strip inline code (`text`)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
+    # Steps 5 and 6 only rewrite text containing markdown markers, so most plain OCR output skips them
+    if any(marker in text for marker in _MARKDOWN_MARKERS):
+        # Step 5: Remove redundant Markdown styling
+        # Strip bold (**text**)
+        text = _BOLD_RE.sub(r'\1', text)
+        # Strip italics (*text* or _text_)
+        text = _ITALIC_STAR_RE.sub(r'\1', text)
+        text = _ITALIC_UNDERSCORE_RE.sub(r'\1', text)
+        # Strip inline code (`text`)
+        text = _INLINE_CODE_RE.sub(r'\1', text)
 
-    # Step 6: Normalize bullet characters
-    text = re.sub(r'^[\s]*[\*\+][\s]*', '- ', text, flags=re.MULTILINE)
+        # Step 6: Normalize bullet characters
+        text = _BULLET_RE.sub('- ', text)
 
     # Step 7: Trim trailing/leading spaces on each line
-    lines = text.split('\n')
-    lines = [line.strip() for line in lines]
-    text = '\n'.join(lines)
-
-    # Final cleanup: remove empty lines and normalize spacing
-    text = re.sub(r'\n\s*\n', '\n', text)  # Remove multiple empty lines
-    text = text.strip()
+    # Final cleanup: remove empty lines in the same pass (trimmed lines have no edge whitespace,
+    # so dropping the empty ones also leaves nothing to strip around the joined text)
+    text = '\n'.join([line for raw_line in text.split('\n') if (line := raw_line.strip())])
 
     return text
 
@@ -147,30 +160,45 @@ def cer(ref: str, hyp: str) -> float:
     ref, hyp = ref.strip(), hyp.strip()
     if not ref:
         return 0.0 if not hyp else 1.0
-    return editdistance.eval(ref, hyp) / len(ref)
+    if ref == hyp:
+        return 0.0
+    return Levenshtein.distance(ref, hyp) / len(ref)
 
 def wer(ref: str, hyp: str) -> float:
     """Word Error Rate."""
-    ref_words, hyp_words = ref.split(), hyp.split()
+    return _wer_from_words(ref.split(), hyp.split())
+
+def _wer_from_words(ref_words: List[str], hyp_words: List[str]) -> float:
     if not ref_words:
         return 0.0 if not hyp_words else 1.0
-    return editdistance.eval(ref_words, hyp_words) / len(ref_words)
+    if ref_words == hyp_words:
+        return 0.0
+    return Levenshtein.distance(ref_words, hyp_words) / len(ref_words)
+
+def _common_count(ref_items: list, hyp_items: list) -> int:
+    """Number of items shared by both lists, counting duplicates (multiset intersection size)."""
+    # Identical or empty inputs don't need the two Counters built at all
+    if ref_items == hyp_items:
+        return len(ref_items)
+    if not ref_items or not hyp_items:
+        return 0
+    return sum((Counter(ref_items) & Counter(hyp_items)).values())
 
 def word_accuracy(ref: str, hyp: str) -> float:
     """Proportion of correctly matched words."""
-    ref_words, hyp_words = ref.lower().split(), hyp.lower().split()
+    return _word_accuracy_from_words(ref.lower().split(), hyp.lower().split())
+
+def _word_accuracy_from_words(ref_words: List[str], hyp_words: List[str]) -> float:
     if not ref_words:
         return 0.0
-    ref_counter, hyp_counter = Counter(ref_words), Counter(hyp_words)
-    common = sum((ref_counter & hyp_counter).values())
-    return common / len(ref_words)
+    return _common_count(ref_words, hyp_words) / len(ref_words)
 
 def extract_table(text: str) -> List[List[str]]:
     """Extract Markdown tables as list-of-lists."""
     tables, current = [], []
     for line in text.splitlines():
         if "|" in line:
-            row = [c.strip() for c in line.split("|") if c.strip()]
+            row = [cell for c in line.split("|") if (cell := c.strip())]
             if row:
                 current.append(row)
         else:
@@ -183,21 +211,22 @@ def extract_table(text: str) -> List[List[str]]:
 
 def table_accuracy(ref: str, hyp: str) -> float:
     """Simple cell overlap metric for markdown tables."""
-    ref_tables, hyp_tables = extract_table(ref), extract_table(hyp)
+    return _table_accuracy_from_tables(extract_table(ref), extract_table(hyp))
+
+def _table_accuracy_from_tables(ref_tables: List[List[List[str]]], hyp_tables: List[List[List[str]]]) -> float:
     if not ref_tables:
         return 0.0
     ref_cells = [c for t in ref_tables for r in t for c in r]
     hyp_cells = [c for t in hyp_tables for r in t for c in r]
     if not ref_cells:
         return 0.0
-    ref_counter, hyp_counter = Counter(ref_cells), Counter(hyp_cells)
-    common = sum((ref_counter & hyp_counter).values())
-    return common / len(ref_cells)
+    return _common_count(ref_cells, hyp_cells) / len(ref_cells)
 
 def table_structure_accuracy(ref: str, hyp: str) -> Dict[str, float]:
     """Calculate table structure accuracy metrics."""
-    ref_tables, hyp_tables = extract_table(ref), extract_table(hyp)
+    return _table_structure_from_tables(extract_table(ref), extract_table(hyp))
 
+def _table_structure_from_tables(ref_tables: List[List[List[str]]], hyp_tables: List[List[List[str]]]) -> Dict[str, float]:
     if not ref_tables:
         return {'row_accuracy': 0.0, 'column_accuracy': 0.0, 'cell_accuracy': 0.0}
 
@@ -208,30 +237,32 @@ def table_structure_accuracy(ref: str, hyp: str) -> Dict[str, float]:
     if total_rows == 0 or total_columns == 0:
         return {'row_accuracy': 0.0, 'column_accuracy': 0.0, 'cell_accuracy': 0.0}
 
-    # Row accuracy
-    matched_rows = 0
-    for ref_table in ref_tables:
-        for hyp_table in hyp_tables:
-            if len(ref_table) == len(hyp_table):
-                matched_rows += len(ref_table)
-                break
+    # Row accuracy: a ref table matches if any hyp table has the same row count
+    hyp_row_counts = {len(hyp_table) for hyp_table in hyp_tables}
+    matched_rows = sum(len(ref_table) for ref_table in ref_tables if len(ref_table) in hyp_row_counts)
 
     # Column accuracy (assuming first row has headers)
-    matched_columns = 0
-    for ref_table in ref_tables:
-        for hyp_table in hyp_tables:
-            if ref_table and hyp_table and len(ref_table[0]) == len(hyp_table[0]):
-                matched_columns += len(ref_table[0])
-                break
+    hyp_column_counts = {len(hyp_table[0]) for hyp_table in hyp_tables if hyp_table}
+    matched_columns = sum(
+        len(ref_table[0]) for ref_table in ref_tables
+        if ref_table and len(ref_table[0]) in hyp_column_counts
+    )
+
+    # Cell accuracy: every hyp table with the same row count contributes its equal-length rows,
+    # so only compare each distinct hyp shape (row lengths) once and weight it by how often it occurs
+    hyp_shapes_by_rows: Dict[int, Counter] = {}
+    for hyp_table in hyp_tables:
+        if hyp_table:
+            shape = tuple(len(row) for row in hyp_table)
+            hyp_shapes_by_rows.setdefault(len(shape), Counter())[shape] += 1
 
-    # Cell accuracy
     matched_cells = 0
     for ref_table in ref_tables:
-        for hyp_table in hyp_tables:
-            if len(ref_table) == len(hyp_table) and ref_table and hyp_table:
-                for ref_row, hyp_row in zip(ref_table, hyp_table):
-                    if len(ref_row) == len(hyp_row):
-                        matched_cells += len(ref_row)
+        ref_shape = [len(row) for row in ref_table]
+        for hyp_shape, count in hyp_shapes_by_rows.get(len(ref_shape), {}).items():
+            matched_cells += count * sum(
+                ref_len for ref_len, hyp_len in zip(ref_shape, hyp_shape) if ref_len == hyp_len
+            )
 
     return {
         'row_accuracy': matched_rows / total_rows if total_rows > 0 else 0.0,
@@ -240,65 +271,83 @@ def table_structure_accuracy(ref: str, hyp: str) -> Dict[str, float]:
     }
 
 def sequence_similarity(ref: str, hyp: str) -> float:
-    """Calculate sequence similarity using difflib."""
-    from difflib import SequenceMatcher
-    return SequenceMatcher(None, ref, hyp).ratio()
+    """Calculate sequence similarity (normalized InDel similarity, 2 * LCS / total length)."""
+    if ref == hyp:
+        return 1.0
+    return fuzz.ratio(ref, hyp) / 100
 
 # ---------- Markdown Evaluation ----------
+PARALLEL_MIN_SAMPLES = 64
+
+# Summary metric -> (results column, value for failed predictions and when none succeeded)
+SUMMARY_METRICS = {
+    "CER": ("CER", 1.0),
+    "WER": ("WER", 1.0),
+    "WordAcc": ("WordAcc", 0.0),
+    "TableAcc": ("TableAcc", 0.0),
+    "SequenceSimilarity": ("SequenceSimilarity", 0.0),
+    "RowAccuracy": ("row_accuracy", 0.0),
+    "ColumnAccuracy": ("column_accuracy", 0.0),
+    "CellAccuracy": ("cell_accuracy", 0.0),
+}
+
 def evaluate_ocr(ref: str, hyp: str) -> Dict[str, float]:
     """Evaluate OCR performance on text."""
     # Normalize both reference and hypothesis for fair comparison
     ref_norm = normalize_text(ref)
     hyp_norm = normalize_text(hyp)
 
+    # Split words and extract tables once and share them between metrics;
+    # normalized text is already lowercase, so WordAcc can reuse the WER split
+    ref_words, hyp_words = ref_norm.split(), hyp_norm.split()
+    ref_tables, hyp_tables = extract_table(ref_norm), extract_table(hyp_norm)
+
     # Basic metrics
     metrics = {
         "CER": cer(ref_norm, hyp_norm),
-        "WER": wer(ref_norm, hyp_norm),
-        "WordAcc": word_accuracy(ref_norm, hyp_norm),
-        "TableAcc": table_accuracy(ref_norm, hyp_norm),
+        "WER": _wer_from_words(ref_words, hyp_words),
+        "WordAcc": _word_accuracy_from_words(ref_words, hyp_words),
+        "TableAcc": _table_accuracy_from_tables(ref_tables, hyp_tables),
         "SequenceSimilarity": sequence_similarity(ref_norm, hyp_norm)
     }
 
     # Table structure metrics
-    table_metrics = table_structure_accuracy(ref_norm, hyp_norm)
+    table_metrics = _table_structure_from_tables(ref_tables, hyp_tables)
     metrics.update(table_metrics)
 
     return metrics
 
+def _evaluate_entry(entry: dict) -> Dict:
+    """Evaluate a single prediction entry (module level so worker processes can pickle it)."""
+    gt = entry['ground_truth_markdown']
+    pred = entry.get('markdown_prediction')
+    success = entry.get('ocr_success', False)
+    sample_id = entry['sample_id']
+
+    if success and pred:
+        metrics = evaluate_ocr(gt, pred)
+        metrics['sample_id'] = sample_id
+        metrics['success'] = True
+        return metrics
+
+    # Failed prediction: every metric gets the same worst-case value the summary reports
+    record = {'sample_id': sample_id}
+    record.update({column: default for column, default in SUMMARY_METRICS.values()})
+    record['success'] = False
+    return record
+
 def evaluate_markdown_predictions(markdown_data: list) -> Tuple[pd.DataFrame, Dict[str, float]]:
     """Evaluate Markdown predictions."""
     print("\nEvaluating Markdown predictions...")
 
-    records = []
-    successful_predictions = 0
-
-    for entry in markdown_data:
-        gt = entry['ground_truth_markdown']
-        pred = entry.get('markdown_prediction')
-        success = entry.get('ocr_success', False)
-        sample_id = entry['sample_id']
-
-        if success and pred:
-            metrics = evaluate_ocr(gt, pred)
-            metrics['sample_id'] = sample_id
-            metrics['success'] = True
-            records.append(metrics)
-            successful_predictions += 1
-        else:
-            # Failed prediction
-            records.append({
-                'sample_id': sample_id,
-                'CER': 1.0,
-                'WER': 1.0,
-                'WordAcc': 0.0,
-                'TableAcc': 0.0,
-                'SequenceSimilarity': 0.0,
-                'row_accuracy': 0.0,
-                'column_accuracy': 0.0,
-                'cell_accuracy': 0.0,
-                'success': False
-            })
+    # Samples are independent and CPU-bound, so spread them over processes;
+    # small runs aren't worth the worker startup cost
+    if len(markdown_data) < PARALLEL_MIN_SAMPLES:
+        records = [_evaluate_entry(entry) for entry in markdown_data]
+    else:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            records = list(executor.map(_evaluate_entry, markdown_data, chunksize=32))
+    successful_predictions = sum(1 for record in records if record['success'])
 
     df = pd.DataFrame(records)
 
@@ -308,15 +357,13 @@ def evaluate_markdown_predictions(markdown_data: list) -> Tuple[pd.DataFrame, Di
         "Total_Samples": len(df),
         "Successful_OCR": successful_predictions,
         "Success_Rate": successful_predictions / len(df) if len(df) > 0 else 0,
-        "CER": successful_df["CER"].mean() if len(successful_df) > 0 else 1.0,
-        "WER": successful_df["WER"].mean() if len(successful_df) > 0 else 1.0,
-        "WordAcc": successful_df["WordAcc"].mean() if len(successful_df) > 0 else 0.0,
-        "TableAcc": successful_df["TableAcc"].mean() if len(successful_df) > 0 else 0.0,
-        "SequenceSimilarity": successful_df["SequenceSimilarity"].mean() if len(successful_df) > 0 else 0.0,
-        "RowAccuracy": successful_df["row_accuracy"].mean() if len(successful_df) > 0 else 0.0,
-        "ColumnAccuracy": successful_df["column_accuracy"].mean() if len(successful_df) > 0 else 0.0,
-        "CellAccuracy": successful_df["cell_accuracy"].mean() if len(successful_df) > 0 else 0.0,
     }
+    if len(successful_df) > 0:
+        # Average every metric column in a single reduction
+        means = successful_df[[column for column, _ in SUMMARY_METRICS.values()]].mean()
+        summary.update({name: means[column] for name, (column, _) in SUMMARY_METRICS.items()})
+    else:
+        summary.update({name: default for name, (_, default) in SUMMARY_METRICS.items()})
 
     return df, summary
 
@@ -1,81 +1,90 @@
-from typing import Dict, Any
-from fastapi import UploadFile
+from typing import Dict, Any, Optional
 from utils.pdf_processor import PDFProcessor
 from utils.ocr_client import OCRClient
 from utils.json_extractor import JSONExtractor
-import tempfile
+from utils.openai_client import create_openai_client
+from utils.response_cache import ResponseCache
 
+# Leading bytes of common image formats (PNG, JPEG, GIF, WebP, TIFF)
+IMAGE_SIGNATURES = (b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'RIFF', b'II*\x00', b'MM\x00*')
 
 
 class OCROrchestrator:
     def __init__(self):
         self.pdf_processor = PDFProcessor()
-        self.ocr_client = OCRClient()
-        self.json_extractor = JSONExtractor()
-
-    def process_ocr_markdown(self, file: UploadFile) -> Dict[str, Any]:
+        # One client (and connection pool) shared by every model call
+        openai_client = create_openai_client()
+        self.ocr_client = OCRClient(openai_client)
+        self.json_extractor = JSONExtractor(openai_client)
+        # OCR markdown keyed by image, shared across endpoints and schemas
+        self.markdown_cache = ResponseCache()
+        # Full /v1/ocr-json results keyed by image and schema
+        self.response_cache = ResponseCache()
+
+    def process_ocr_markdown(self, file_bytes: bytes, content_type: Optional[str], filename: Optional[str]) -> Dict[str, Any]:
         """
         Process a PDF or image file and return OCR results in Markdown format.
         """
-        # Check file type
-        content_type = file.content_type.lower()
-        file_extension = file.filename.lower().split('.')[-1] if file.filename else ''
-
-        if content_type == 'application/pdf' or file_extension == 'pdf':
-            processed_pdf_bytes = self.pdf_processor.preprocess_pdf(file)
-            image_paths = self.pdf_processor._pdf_bytes_to_images(processed_pdf_bytes)
-        else:
-            image_paths = self._save_uploaded_image(file)
+        image_bytes = self._prepare_image(file_bytes, content_type, filename)
+        image_key = ResponseCache.make_key(image_bytes)
 
-        with open(image_paths[0], 'rb') as f:
-            image_bytes = f.read()
-
-        ocr_result = self.ocr_client.markdown_openai(image_bytes)
+        ocr_result = self._markdown_for(image_bytes, image_key)
 
         return {
             "status": "success",
-            "image_paths": image_paths,
             "ocr_result": ocr_result
         }
 
-    def process_ocr_json(self, file: UploadFile, schema: Dict[str, Any]) -> Dict[str, Any]:
+    def process_ocr_json(self, file_bytes: bytes, content_type: Optional[str], filename: Optional[str], schema: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
         """
         Process a PDF or image file and return OCR results as structured JSON.
+        The intermediate markdown is only included when verbose is set.
         """
-        # Check file type
-        content_type = file.content_type.lower()
-        file_extension = file.filename.lower().split('.')[-1] if file.filename else ''
+        image_bytes = self._prepare_image(file_bytes, content_type, filename)
+
+        image_key = ResponseCache.make_key(image_bytes)
+        cache_key = ResponseCache.with_schema(image_key, schema)
+        result = self.response_cache.get_or_compute(
+            cache_key, lambda: self._run_ocr_json(image_bytes, image_key, schema)
+        )
 
-        if content_type == 'application/pdf' or file_extension == 'pdf':
-            processed_pdf_bytes = self.pdf_processor.preprocess_pdf(file)
-            image_paths = self.pdf_processor._pdf_bytes_to_images(processed_pdf_bytes)
-        else:
-            image_paths = self._save_uploaded_image(file)
+        if verbose:
+            return result
+        return {key: value for key, value in result.items() if key != "markdown_result"}
 
-        with open(image_paths[0], 'rb') as f:
-            image_bytes = f.read()
+    def _markdown_for(self, image_bytes: bytes, image_key: str) -> str:
+        """Run OCR on the image, reusing the markdown from any earlier request for the same image."""
+        return self.markdown_cache.get_or_compute(
+            image_key, lambda: self.ocr_client.markdown_openai(image_bytes)
+        )
 
-        markdown_result = self.ocr_client.markdown_openai(image_bytes)
+    def _run_ocr_json(self, image_bytes: bytes, image_key: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        markdown_result = self._markdown_for(image_bytes, image_key)
 
         json_result = self.json_extractor.extract_json(markdown_result, schema)
 
         return {
             "status": "success",
-            "image_paths": image_paths,
             "markdown_result": markdown_result,
             "ocr_result": json_result
         }
 
-    def _save_uploaded_image(self, file: UploadFile) -> list:
-        """Save uploaded image to temporary file and return path."""
-        try:
-            file_content = file.file.read()
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.split('.')[-1] if file.filename else 'jpg'}") as temp_file:
-                temp_file.write(file_content)
-                temp_path = temp_file.name
-
-            return [temp_path]
-
-        except Exception as e:
-            raise Exception(f"Error saving uploaded image: {str(e)}")
+    def _prepare_image(self, file_bytes: bytes, content_type: Optional[str], filename: Optional[str]) -> bytes:
+        """Return the image bytes to send to the model, keeping everything in memory."""
+        if self._is_pdf(file_bytes, content_type, filename):
+            # Only the first page is sent to the model, so clean up and render just that page
+            return self.pdf_processor.render_page(file_bytes, 0, preprocess=True)
+
+        return file_bytes
+
+    @staticmethod
+    def _is_pdf(file_bytes: bytes, content_type: Optional[str], filename: Optional[str]) -> bool:
+        """Detect PDFs by their magic bytes, falling back to the declared type for unknown content."""
+        if file_bytes.startswith(b'%PDF'):
+            return True
+        if file_bytes.startswith(IMAGE_SIGNATURES):
+            return False
+
+        content_type = (content_type or '').lower()
+        file_extension = filename.lower().split('.')[-1] if filename else ''
+        return content_type == 'application/pdf' or file_extension == 'pdf'
@@ -1,10 +1,13 @@
 import json
+import orjson
+from typing import Optional
 from openai import OpenAI
+from utils.openai_client import create_openai_client
 from prompts.prompt import JSON_EXTRACTION_SYSTEM_PROMPT
 
 class JSONExtractor:
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(self, client: Optional[OpenAI] = None):
+        self.client = client or create_openai_client()
 
     def extract_json(self, markdown: str, schema: dict) -> dict:
         try:
@@ -17,11 +20,20 @@ class JSONExtractor:
                     },
                     {
                         "role": "user",
-                        "content": f"Schema: {json.dumps(schema, indent=2)}\n\nDocument:\n{markdown}"
+                        "content": f"Schema: {self._dump_schema(schema)}\n\nDocument:\n{markdown}"
                     }
                 ],
                 response_format={"type": "json_object"}
             )
+            # stdlib json keeps integers wider than 64 bits exact, where orjson would round them
             return json.loads(response.choices[0].message.content)
         except Exception as e:
             raise Exception(f"JSON extraction failed: {str(e)}")
+
+    @staticmethod
+    def _dump_schema(schema: dict) -> str:
+        try:
+            return orjson.dumps(schema, option=orjson.OPT_INDENT_2).decode()
+        except orjson.JSONEncodeError:
+            # orjson rejects integers wider than 64 bits
+            return json.dumps(schema, indent=2)
@@ -1,20 +1,24 @@
 import base64
 import json
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Optional
 from openai import OpenAI
+from utils.openai_client import create_openai_client
 from prompts.prompt import SYSTEM_MARKDOWN_PROMPT, USER_MARKDOWN_PROMPT
 
 
 class OCRClient:
     """OpenAI OCR client for extracting text from images."""
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(self, client: Optional[OpenAI] = None):
+        self.client = client or create_openai_client()
+        # Transcribing a dense page can take minutes, so allow more than the client-wide default
+        self.timeout = float(os.getenv("OPENAI_OCR_TIMEOUT_S", "180"))
 
 
     def markdown_openai(self, image_bytes: bytes) -> str:
         try:
             encoded_image = base64.b64encode(image_bytes).decode('utf-8')
-            image_url = f"data:image/png;base64,{encoded_image}"
+            image_url = f"data:{self._image_mime_type(image_bytes)};base64,{encoded_image}"
             response = self.client.chat.completions.create(
                 model="gpt-4o-2024-08-06",
                 messages=[
@@ -23,10 +27,22 @@ class OCRClient:
                                                 {"type": "image_url", "image_url": {"url": image_url}}
                     ]
                     }
-                ]
+                ],
+                timeout=self.timeout
                 # no response_format → default is text
             )
             return response.choices[0].message.content
 
         except Exception as e:
-            raise Exception(f"Markdown extraction failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Markdown extraction failed: {str(e)}")
+
+    @staticmethod
+    def _image_mime_type(image_bytes: bytes) -> str:
+        """Detect the image MIME type from its magic bytes, defaulting to PNG."""
+        if image_bytes.startswith(b'\xff\xd8\xff'):
+            return "image/jpeg"
+        if image_bytes.startswith((b'GIF87a', b'GIF89a')):
+            return "image/gif"
+        if image_bytes.startswith(b'RIFF') and image_bytes[8:12] == b'WEBP':
+            return "image/webp"
+        return "image/png"
@@ -0,0 +1,10 @@
+import os
+from openai import OpenAI
+
+
+def create_openai_client() -> OpenAI:
+    """Create an OpenAI client with a bounded default timeout (JSON extraction); OCR calls set their own."""
+    return OpenAI(
+        timeout=float(os.getenv("OPENAI_TIMEOUT_S", "60")),
+        max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+    )
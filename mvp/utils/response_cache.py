@@ -0,0 +1,87 @@
+import hashlib
+import json
+import orjson
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+
+class ResponseCache:
+    """Thread-safe in-memory LRU cache for OCR results keyed by content hash."""
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_bytes: bytes) -> str:
+        """Build a cache key from the image content."""
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    @staticmethod
+    def with_schema(image_key: str, schema: Any) -> str:
+        """Extend an image-only key with the extraction schema, without rehashing the image."""
+        try:
+            schema_bytes = orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)
+        except orjson.JSONEncodeError:
+            # orjson rejects integers wider than 64 bits
+            schema_bytes = json.dumps(schema, sort_keys=True).encode()
+        return image_key + ":" + hashlib.sha256(schema_bytes).hexdigest()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, or compute it.
+
+        Concurrent callers asking for the same key while it is being computed
+        wait for that single computation instead of starting their own.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, value)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def _lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)